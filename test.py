@@ -1,58 +1,37 @@
+import asyncio
+import atexit
+import functools
+import importlib.util
 import json
-from web3 import Web3
-from web3.contract import Contract
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+# Every selector, event topic and address checksum goes through eth-hash's keccak, which
+# picks its backend on first use; prefer the pysha3 C implementation when it's installed
+if importlib.util.find_spec("sha3") is not None:
+    os.environ.setdefault("ETH_HASH_BACKEND", "pysha3")
+
+import aiohttp
+import eth_abi
+from eth_abi.exceptions import DecodingError
+from web3 import AsyncIPCProvider, AsyncWeb3, PersistentConnectionProvider, Web3, WebSocketProvider
+from web3.exceptions import ContractLogicError, ProviderConnectionError
 from eth_utils import to_checksum_address
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Checksumming runs a keccak per address, and the same pools, tokens and
+# recipients come up over and over, so memoize it
+checksum_address = functools.lru_cache(maxsize=8192)(to_checksum_address)
 
 class UniswapV3Decoder:
-    POOL_ABI = [
-        {
-            "constant": True,
-            "inputs": [],
-            "name": "token0",
-            "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-            "type": "function"
-        },
-        {
-            "constant": True,
-            "inputs": [],
-            "name": "token1",
-            "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-            "type": "function"
-        },
-        {
-            "anonymous": False,
-            "inputs": [
-                {"indexed": True, "name": "sender", "type": "address"},
-                {"indexed": True, "name": "recipient", "type": "address"},
-                {"indexed": False, "name": "amount0", "type": "int256"},
-                {"indexed": False, "name": "amount1", "type": "int256"},
-                {"indexed": False, "name": "sqrtPriceX96", "type": "uint160"},
-                {"indexed": False, "name": "liquidity", "type": "uint128"},
-                {"indexed": False, "name": "tick", "type": "int24"}
-            ],
-            "name": "Swap",
-            "type": "event"
-        }
-    ]
+    # Swap event topic, computed once at import instead of per log
+    SWAP_TOPIC0 = Web3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)")
     
-    # ERC20 ABI (partial - just for decimals)
-    ERC20_ABI = [
-        {
-            "constant": True,
-            "inputs": [],
-            "name": "decimals",
-            "outputs": [{"name": "", "type": "uint8"}],
-            "type": "function"
-        },
-        {
-            "constant": True,
-            "inputs": [],
-            "name": "symbol",
-            "outputs": [{"name": "", "type": "string"}],
-            "type": "function"
-        }
-    ]
+    # Non-indexed Swap event fields, in log data order
+    SWAP_DATA_TYPES = ["int256", "int256", "uint160", "uint128", "int24"]
     
     # Uniswap V3 Router ABI (partial)
     ROUTER_ABI = [
@@ -78,16 +57,205 @@ class UniswapV3Decoder:
         }
     ]
     
-    # Known Uniswap V3 addresses
+    # Function selectors, precomputed so calls can be made as raw eth_calls
+    SEL_AGGREGATE3 = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+    SEL_TOKEN0 = Web3.keccak(text="token0()")[:4]
+    SEL_TOKEN1 = Web3.keccak(text="token1()")[:4]
+    SEL_DECIMALS = Web3.keccak(text="decimals()")[:4]
+    SEL_SYMBOL = Web3.keccak(text="symbol()")[:4]
+    SEL_EXACT_INPUT = Web3.keccak(text="exactInput((bytes,address,uint256,uint256,uint256))")[:4]
+    
+    # Used for tokens whose decimals()/symbol() reverts or returns something else (ETH and
+    # most tokens have 18 decimals)
+    DEFAULT_DECIMALS = 18
+    DEFAULT_SYMBOL = "UNKNOWN"
+    
+    # Multicall3 is deployed at the same address on most EVM chains
+    MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+    
+    # Well-known Ethereum mainnet tokens: address -> (decimals, symbol)
+    MAINNET_CHAIN_ID = 1
+    KNOWN_TOKENS = {
+        "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2": (18, "WETH"),
+        "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48": (6, "USDC"),
+        "0xdAC17F958D2ee523a2206206994597C13D831ec7": (6, "USDT"),
+        "0x6B175474E89094C44Da98b954EedeAC495271d0F": (18, "DAI"),
+        "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599": (8, "WBTC"),
+        "0xcbB7C0000aB88B473b1f5aFd9ef808440eed33Bf": (8, "cbBTC"),
+        "0xae7ab96520DE3A18E5e111B5EaAb095312D7fE84": (18, "stETH"),
+        "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0": (18, "wstETH"),
+        "0xae78736Cd615f374D3085123A210448E74Fc6393": (18, "rETH"),
+        "0xBe9895146f7AF43049ca1c1AE358B0541Ea49704": (18, "cbETH"),
+        "0xCd5fE23C85820F7B72D0926FC9b05b43E359b7ee": (18, "weETH"),
+        "0x853d955aCEf822Db058eb8505911ED77F175b99e": (18, "FRAX"),
+        "0x5f98805A4E8be255a32880FDeC7F6728C6568bA0": (18, "LUSD"),
+        "0x4Fabb145d64652a948d72533023f6E7A623C7C53": (18, "BUSD"),
+        "0x0000000000085d4780B73119b644AE5ecd22b376": (18, "TUSD"),
+        "0x056Fd409E1d7A124BD7017459dFEa2F387b6d5Cd": (2, "GUSD"),
+        "0x6c3ea9036406852006290770BEdFcAbA0e23A0e8": (6, "PYUSD"),
+        "0x4c9EDD5852cd905f086C759E8383e09bff1E68B3": (18, "USDe"),
+        "0x1f9840a85d5aF5bf1D1762F925BDADdC4201F984": (18, "UNI"),
+        "0x514910771AF9Ca656af840dff83E8264EcF986CA": (18, "LINK"),
+        "0x7Fc66500c84A76Ad7e9c93437bFc5Ac33E2DDaE9": (18, "AAVE"),
+        "0x9f8F72aA9304c8B593d555F12eF6589cC3A579A2": (18, "MKR"),
+        "0x5A98FcBEA516Cf06857215779Fd812CA3beF1B32": (18, "LDO"),
+        "0xD533a949740bb3306d119CC777fa900bA034cd52": (18, "CRV"),
+        "0xc00e94Cb662C3520282E6f5717214004A7f26888": (18, "COMP"),
+        "0xC011a73ee8576Fb46F5E1c5751cA3B9Fe0af2a6F": (18, "SNX"),
+        "0x111111111117dC0aa78b770fA6A738034120C302": (18, "1INCH"),
+        "0x6B3595068778DD592e39A122f4f5a5cF09C90fE2": (18, "SUSHI"),
+        "0x3432B6A60D23Ca0dFCa7761B7ab56459D9C964D0": (18, "FXS"),
+        "0xba100000625a3754423978a60c9317c58a424e3D": (18, "BAL"),
+        "0x0bc529c00C6401aEF6D220BE8C6Ea1667F6Ad93e": (18, "YFI"),
+        "0xD33526068D116cE69F19A9ee46F0bd304F21A51f": (18, "RPL"),
+        "0x6810e776880C02933D47DB1b9fc05908e5386b96": (18, "GNO"),
+        "0xE41d2489571d322189246DaFA5ebDe1F4699F498": (18, "ZRX"),
+        "0xC18360217D8F7Ab5e7c516566761Ea12Ce7F9D72": (18, "ENS"),
+        "0x57e114B691Db790C35207b2e685D4A43181e6061": (18, "ENA"),
+        "0xfAbA6f8e4a5E8Ab82F62fe7C39859FA577269BE3": (18, "ONDO"),
+        "0x7D1AfA7B718fb893dB30A3aBc0Cfc608AaCfeBB0": (18, "MATIC"),
+        "0xB50721BCf8d664c30412Cfbc6cf7a15145234ad1": (18, "ARB"),
+        "0xc944E90C64B2c07662A292be6244BDf05Cda44a7": (18, "GRT"),
+        "0xaea46A60368A7bD060eec7DF8CBa43b7EF41Ad85": (18, "FET"),
+        "0x6De037ef9aD2725EB40118Bb1702EBb27e4Aeb24": (18, "RNDR"),
+        "0xF57e7e7C23978C3cAEC3C3548E3D615c346e79fF": (18, "IMX"),
+        "0x4a220E6096B25EADb88358cb44068A3248254675": (18, "QNT"),
+        "0x95aD61b0a150d79219dCF64E1E6Cc01f0B64C4cE": (18, "SHIB"),
+        "0x6982508145454Ce325dDbE47a25d4ec3d2311933": (18, "PEPE"),
+        "0x4d224452801ACEd8B2F0aebE155379bb5D594381": (18, "APE"),
+        "0x5283D291DBCF85356A21bA090E6db59121208b44": (18, "BLUR"),
+        "0x0F5D2fB29fb7d3CFeE444a200298f468908cC942": (18, "MANA"),
+        "0x3845badAde8e6dFF049820680d1F14bD3903a5d0": (18, "SAND"),
+        "0x0D8775F648430679A709E98d2b0Cb6250d2887EF": (18, "BAT"),
+    }
+    
+    # Top Uniswap V3 mainnet pools: pool address -> (token0, token1)
+    KNOWN_POOLS = {
+        "0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640": (  # USDC/WETH 0.05%
+            "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8": (  # USDC/WETH 0.3%
+            "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0xE0554a476A092703abdB3Ef35c80e0D76d32939F": (  # USDC/WETH 0.01%
+            "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0x11b815efB8f581194ae79006d24E0d814B7697F6": (  # WETH/USDT 0.05%
+            "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2", "0xdAC17F958D2ee523a2206206994597C13D831ec7"),
+        "0x4e68Ccd3E89f51C3074ca5072bbAC773960dFa36": (  # WETH/USDT 0.3%
+            "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2", "0xdAC17F958D2ee523a2206206994597C13D831ec7"),
+        "0x4585FE77225b41b697C938B018E2Ac67Ac5a20c0": (  # WBTC/WETH 0.05%
+            "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0xCBCdF9626bC03E24f779434178A73a0B4bad62eD": (  # WBTC/WETH 0.3%
+            "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0x60594a405d53811d3BC4766596EFD80fd545A270": (  # DAI/WETH 0.05%
+            "0x6B175474E89094C44Da98b954EedeAC495271d0F", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0xC2e9F25Be6257c210d7Adf0D4Cd6E3E881ba25f8": (  # DAI/WETH 0.3%
+            "0x6B175474E89094C44Da98b954EedeAC495271d0F", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0x5777d92f208679DB4b9778590Fa3CAB3aC9e2168": (  # DAI/USDC 0.01%
+            "0x6B175474E89094C44Da98b954EedeAC495271d0F", "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"),
+        "0x3416cF6C708Da44DB2624D63ea0AAef7113527C6": (  # USDC/USDT 0.01%
+            "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0xdAC17F958D2ee523a2206206994597C13D831ec7"),
+        "0x7858E59e0C01EA06Df3aF3D20aC7B0003275D4Bf": (  # USDC/USDT 0.05%
+            "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48", "0xdAC17F958D2ee523a2206206994597C13D831ec7"),
+        "0x99ac8cA7087fA4A2A1FB6357269965A2014ABc35": (  # WBTC/USDC 0.3%
+            "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"),
+        "0x9Db9e0e53058C89e5B94e29621a205198648425B": (  # WBTC/USDT 0.3%
+            "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599", "0xdAC17F958D2ee523a2206206994597C13D831ec7"),
+        "0x109830a1AAaD605BbF02a9dFA7B0B92EC2FB7dAa": (  # wstETH/WETH 0.01%
+            "0x7f39C581F595B53c5cb19bD0b3f8dA6c935E2Ca0", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0xa6Cc3C2531FdaA6Ae1A3CA84c2855806728693e8": (  # LINK/WETH 0.3%
+            "0x514910771AF9Ca656af840dff83E8264EcF986CA", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+        "0x1d42064Fc4Beb5F8aAF85F4617AE8b3b5B8Bd801": (  # UNI/WETH 0.3%
+            "0x1f9840a85d5aF5bf1D1762F925BDADdC4201F984", "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+    }
+    
+    # Token metadata and pool tokens never change, so they are cached on disk across runs,
+    # one file per chain since the same address can be a different contract elsewhere
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "uniswap_decoder")
+    TOKEN_CACHE_FILE = os.path.join(CACHE_DIR, "tokens-{chain_id}.json")
+    POOL_CACHE_FILE = os.path.join(CACHE_DIR, "pools-{chain_id}.json")
+    
+    # Powers of ten for every realistic token decimals value
+    _POW10 = [10 ** i for i in range(40)]
+    
+    # Known Uniswap V3 addresses (already checksummed)
     UNISWAP_V3_ROUTER = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
     UNISWAP_V3_ROUTER_2 = "0x68b3465833fb72A70ecDF485E0e4C7bD8665Fc45"
     
+    # Raw 20-byte router addresses for case-insensitive O(1) lookups
+    _ROUTER_ADDRESSES = frozenset(
+        bytes.fromhex(address[2:]) for address in (UNISWAP_V3_ROUTER, UNISWAP_V3_ROUTER_2)
+    )
+    
+    # Shared by every decoder in the process, see _is_reachable, _get_chain_id,
+    # _has_multicall, _get_router and _load_shared_caches
+    _reachable_nodes: Set[str] = set()
+    _chain_ids: Dict[str, int] = {}
+    # (time.monotonic() when fetched, block number) by node, see _get_chain_head
+    _chain_heads: Dict[str, Tuple[float, int]] = {}
+    _multicall_deployed: Dict[str, bool] = {}
+    _router = None
+    _token_caches: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    _pool_caches: Dict[int, Dict[str, Tuple[str, str]]] = {}
+    # Caches changed since they were last written, by file path, see _flush_caches
+    _dirty_caches: Dict[str, Dict[str, Any]] = {}
+    # Decoded results of finalized transactions by (chain id, tx hash), least recently used first;
+    # pre-EIP-155 transactions can be replayed with the same hash on other chains
+    _result_cache: "OrderedDict[Tuple[int, str], Dict[str, Any]]" = OrderedDict()
+    
+    RESULT_CACHE_SIZE = 16384
+    # Transactions this many blocks deep are treated as final (safe from reorgs)
+    FINALITY_DEPTH = 12
+    # The chain head is reused for this many seconds (about one block); a stale head only
+    # makes the finality check more conservative
+    CHAIN_HEAD_TTL = 12.0
+    
     # 替换 __init__ 方法中的默认 URL
     def __init__(self, rpc_url: str = None):
-        """Initialize decoder with RPC URL"""
+        """Initialize decoder with RPC URL (the node is only contacted on first use, see connect).
+        
+        rpc_url may be an http(s):// URL, a ws(s):// URL or the path of a node's IPC socket.
+        WebSocket and IPC keep a single persistent connection with no per-request HTTP
+        framing, so concurrent decoding (decode_swaps_async) scales best over them.
+        """
+        
+        self._rpc_url = rpc_url
+        self._node_url: Optional[str] = None
+        self._chain_id: Optional[int] = None
+        self.w3: Optional[AsyncWeb3] = None
+        self._connected = False
+        
+        # Keep-alive connection pools shared by all HTTP RPCs, one per event loop
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        # Event loop the provider's connection (HTTP pool or WebSocket/IPC socket) is attached to
+        self._provider_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Event loop reused across decode_swap calls so the pool stays warm
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Lookups currently running, shared by concurrent decodes, see _single_flight
+        self._in_flight: Dict[Any, asyncio.Future] = {}
+        
+        # Caches of the connected chain, set by connect
+        self._token_cache: Optional[Dict[str, Dict[str, Any]]] = None
+        self._pool_cache: Optional[Dict[str, Tuple[str, str]]] = None
+    
+    async def connect(self) -> None:
+        """Connect to the Ethereum node, a no-op once connected"""
+        if self._connected:
+            if self._provider_loop is not asyncio.get_running_loop():
+                if not isinstance(self.w3.provider, PersistentConnectionProvider):
+                    # First use from another event loop, it gets its own connection pool
+                    await self._attach_provider(self.w3)
+                elif not self._provider_loop.is_closed():
+                    # Its listener task runs on that loop, which is the only place it can be closed
+                    raise RuntimeError(
+                        "The WebSocket/IPC connection is in use on another event loop, "
+                        "use a separate decoder per loop"
+                    )
+                else:
+                    # The connection went away with its loop, open a new one on this loop
+                    self.w3 = await self._make_w3(self._node_url)
+            return
         
         # 如果没有提供 URL，使用公共节点
-        if rpc_url is None:
+        if self._rpc_url is None:
             # 选择其中一个公共节点
             public_nodes = [
                 "https://ethereum.publicnode.com",  # Public Node
@@ -96,72 +264,189 @@ class UniswapV3Decoder:
             # 尝试每个节点直到成功
             for node_url in public_nodes:
                 try:
-                    self.w3 = Web3(Web3.HTTPProvider(node_url))
-                    if self.w3.is_connected():
+                    self.w3 = await self._make_w3(node_url)
+                    if await self._is_reachable(node_url):
                         print(f"Connected to: {node_url}")
                         break
-                except:
-                    continue
+                except Exception:
+                    pass
+                # Don't leave the failed attempt's connection open
+                await self._close_connections()
             else:
                 raise ConnectionError("Failed to connect to any public node")
         else:
             # 使用用户提供的 URL
-            self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+            node_url = self._rpc_url
+            try:
+                self.w3 = await self._make_w3(node_url)
+            except ProviderConnectionError as e:
+                raise ConnectionError("Failed to connect to Ethereum node") from e
+            
+            # 最终检查
+            if not await self._is_reachable(node_url):
+                await self._close_connections()
+                raise ConnectionError("Failed to connect to Ethereum node")
         
-        # 最终检查
-        if not self.w3.is_connected():
-            raise ConnectionError("Failed to connect to Ethereum node")
+        self._node_url = node_url
+        self._chain_id = await self._get_chain_id(node_url)
+        self._load_shared_caches(self._chain_id)
+        self._connected = True
+    
+    async def _is_reachable(self, node_url: str) -> bool:
+        """Probe node_url with self.w3, at most once per process"""
+        if node_url not in self._reachable_nodes:
+            if not await self.w3.is_connected():
+                return False
+            self._reachable_nodes.add(node_url)
+        return True
+    
+    async def _get_chain_id(self, node_url: str) -> int:
+        """Chain id of node_url, asked at most once per process"""
+        chain_id = self._chain_ids.get(node_url)
+        if chain_id is None:
+            chain_id = await self.w3.eth.chain_id
+            self._chain_ids[node_url] = chain_id
+        return chain_id
+    
+    async def _make_w3(self, node_url: str) -> AsyncWeb3:
+        """Create a client for node_url: a ws(s):// URL, an http(s):// URL or an IPC socket path"""
+        scheme = urlsplit(node_url).scheme.lower()
+        if scheme in ("ws", "wss"):
+            # web3 only accepts a lowercase ws:// or wss:// prefix
+            provider = WebSocketProvider(scheme + node_url[len(scheme):])
+        elif scheme in ("http", "https"):
+            provider = AsyncWeb3.AsyncHTTPProvider(
+                node_url,
+                request_kwargs={"timeout": aiohttp.ClientTimeout(total=10)}
+            )
+        else:
+            provider = AsyncIPCProvider(node_url)
+        
+        w3 = AsyncWeb3(provider)
+        # The validation middleware asks the node for eth_chainId before every eth_call just to
+        # check a chainId field these read-only calls never set; connect reads it once instead
+        w3.middleware_onion.remove("validation")
+        await self._attach_provider(w3)
+        return w3
+    
+    async def _attach_provider(self, w3: AsyncWeb3) -> None:
+        """Attach w3's connection to the running event loop"""
+        if isinstance(w3.provider, PersistentConnectionProvider):
+            # WebSocket/IPC connections live on the loop they were opened on
+            await w3.provider.connect()
+        else:
+            await w3.provider.cache_async_session(await self._get_session())
+        self._provider_loop = asyncio.get_running_loop()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the keep-alive session for the running event loop"""
+        await self._close_stale_sessions()
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None:
+            # web3's default session closes the connection after every request
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60),
+                headers={"Connection": "keep-alive"},
+                raise_for_status=True
+            )
+            self._sessions[loop] = session
+        return session
+    
+    async def _close_stale_sessions(self) -> None:
+        """Close the sessions of event loops that have been closed since (e.g. by asyncio.run)"""
+        for loop in [loop for loop in self._sessions if loop.is_closed()]:
+            await self._sessions.pop(loop).close()
+    
+    async def aclose(self) -> None:
+        """Write new cache entries to disk and close the connections attached to the running loop"""
+        await asyncio.to_thread(self._flush_caches)
+        await self._close_connections()
+    
+    async def _close_connections(self) -> None:
+        """Close the pool or persistent connection attached to the running loop"""
+        await self._close_stale_sessions()
+        loop = asyncio.get_running_loop()
+        closed = False
+        if (
+            self.w3 is not None
+            and self._provider_loop is loop
+            and isinstance(self.w3.provider, PersistentConnectionProvider)
+        ):
+            await self.w3.provider.disconnect()
+            closed = True
+        session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+            closed = True
+        if closed:
+            # The client still refers to the closed connection, start over on next use
+            self._connected = False
+            self._provider_loop = None
+    
+    def close(self) -> None:
+        """Close decode_swap's connections and event loop (await aclose() for other loops)"""
+        if self._loop is not None:
+            self._loop.run_until_complete(self.aclose())
+            self._loop.close()
+            self._loop = None
     
     def decode_swap(self, tx_hash: str) -> Dict[str, Any]:
+        """Decode a Uniswap V3 swap transaction (blocking wrapper around decode_swap_async)"""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.decode_swap_async(tx_hash))
+    
+    async def decode_swap_async(self, tx_hash: str) -> Dict[str, Any]:
         """Main function to decode a Uniswap V3 swap transaction"""
         
-        # Get transaction and receipt
-        tx = self.w3.eth.get_transaction(tx_hash)
-        receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        await self.connect()
+        
+        # A finalized transaction always decodes to the same result on a given chain
+        cache_key = (self._chain_id, tx_hash.lower())
+        cached_result = self._result_cache.get(cache_key)
+        if cached_result is not None:
+            try:
+                self._result_cache.move_to_end(cache_key)
+            except KeyError:
+                # Evicted by another thread in the meantime, the result is still valid
+                pass
+            # Echo the hash as the caller spelled it
+            return dict(cached_result, transaction_hash=tx_hash)
+        
+        # Get transaction, receipt and chain head concurrently
+        tx, receipt, latest_block = await asyncio.gather(
+            self.w3.eth.get_transaction(tx_hash),
+            self.w3.eth.get_transaction_receipt(tx_hash),
+            self._get_chain_head(),
+        )
         
         # Get sender
         sender = tx['from']
         
-        # Find Swap events in logs
-        swap_events = []
-        for log in receipt['logs']:
-            try:
-                # Check if this is a Swap event from a Uniswap V3 pool
-                pool_contract = self.w3.eth.contract(
-                    address=log['address'],
-                    abi=self.POOL_ABI
-                )
-                
-                # Try to decode as Swap event
-                event_signature = self.w3.keccak(text="Swap(address,address,int256,int256,uint160,uint128,int24)").hex()
-                if log['topics'][0].hex() == event_signature:
-                    decoded_event = pool_contract.events.Swap().process_log(log)
-                    swap_events.append({
-                        'pool': log['address'],
-                        'event': decoded_event
-                    })
-            except:
-                continue
+        # Find the first Swap event in logs (topic0 plus the two indexed addresses);
+        # for simplicity only it is decoded (most transactions have only one)
+        swap_log = next(
+            (
+                log for log in receipt['logs']
+                if len(log['topics']) >= 3 and log['topics'][0] == self.SWAP_TOPIC0
+            ),
+            None
+        )
         
-        if not swap_events:
+        if swap_log is None:
             raise ValueError("No Uniswap V3 swap events found in transaction")
         
-        # For simplicity, take the first swap event (most transactions have only one)
-        swap_event = swap_events[0]['event']
-        pool_address = swap_events[0]['pool']
+        pool_address = swap_log['address']
         
-        # Get pool contract to fetch tokens
-        pool_contract = self.w3.eth.contract(
-            address=pool_address,
-            abi=self.POOL_ABI
-        )
+        # The Swap data is a fixed 5 x 32-byte layout and the indexed addresses sit in
+        # the topics, so decode it directly rather than through the event ABI
+        amount0, amount1, _, _, _ = eth_abi.decode(self.SWAP_DATA_TYPES, swap_log['data'])
+        recipient_address = bytes(swap_log['topics'][2][-20:])
         
-        token0 = pool_contract.functions.token0().call()
-        token1 = pool_contract.functions.token1().call()
+        token0, token1 = await self._get_pool_tokens(pool_address)
         
         # Determine which token is input and which is output
-        amount0 = swap_event['args']['amount0']
-        amount1 = swap_event['args']['amount1']
         
         # Positive amount = pool received, Negative amount = pool sent
         if amount0 < 0 and amount1 > 0:
@@ -177,43 +462,30 @@ class UniswapV3Decoder:
         else:
             raise ValueError("Invalid swap amounts - could not determine direction")
         
-        # Get token decimals
-        token_in_decimals = self._get_token_decimals(token_in)
-        token_out_decimals = self._get_token_decimals(token_out)
+        # Get token decimals and symbols in one aggregated call
+        (token_in_decimals, token_out_decimals), (token_in_symbol, token_out_symbol), tokens_complete = \
+            await self._get_tokens_info([token_in, token_out])
         
         # Calculate human-readable amounts
-        amount_in_human = amount_in_abs / (10 ** token_in_decimals)
-        amount_out_human = amount_out_abs / (10 ** token_out_decimals)
+        amount_in_human = self._format_amount(amount_in_abs, token_in_decimals)
+        amount_out_human = self._format_amount(amount_out_abs, token_out_decimals)
         
         # Try to get the recipient from the swap event or transaction
-        recipient = swap_event['args']['recipient']
+        recipient = checksum_address(recipient_address)
         
-        # If recipient is a router, try to decode the transaction input to find final recipient
-        if recipient.lower() in [self.UNISWAP_V3_ROUTER.lower(), self.UNISWAP_V3_ROUTER_2.lower()]:
+        # If recipient is a router and the call is exactInput, decode the transaction input
+        # to find final recipient (a selector check is far cheaper than a failed decode)
+        if recipient_address in self._ROUTER_ADDRESSES and tx['input'][:4] == self.SEL_EXACT_INPUT:
             try:
-                # Try to decode router call
-                router_contract = self.w3.eth.contract(
-                    address=to_checksum_address(self.UNISWAP_V3_ROUTER),
-                    abi=self.ROUTER_ABI
-                )
-                
-                # Decode the transaction input
-                func_obj, func_params = router_contract.decode_function_input(tx['input'])
-                
-                if func_obj.fn_name == "exactInput":
-                    # The recipient is in the params
-                    recipient = func_params['params']['recipient']
+                _, func_params = self._get_router().decode_function_input(tx['input'])
+                # The recipient is in the params
+                recipient = func_params['params']['recipient']
             except:
                 # If decoding fails, use the swap event recipient
                 pass
         
-        # Get token symbols (optional, for better readability)
-        try:
-            token_in_symbol = self._get_token_symbol(token_in)
-            token_out_symbol = self._get_token_symbol(token_out)
-            token_display = f"{token_in_symbol} ({token_in}) / {token_out_symbol} ({token_out})"
-        except:
-            token_display = f"{token_in} / {token_out}"
+        # Token symbols (optional, for better readability)
+        token_display = f"{token_in_symbol} ({token_in}) / {token_out_symbol} ({token_out})"
         
         result = {
             "transaction_hash": tx_hash,
@@ -222,36 +494,295 @@ class UniswapV3Decoder:
             "token_in": token_in,
             "token_out": token_out,
             "token_display": token_display,
-            "amount_in": str(amount_in_human),
-            "amount_out": str(amount_out_human),
+            "amount_in": amount_in_human,
+            "amount_out": amount_out_human,
         }
         
-        return result
+        # A default standing in for a failed token lookup must not outlive the node hiccup
+        if tokens_complete and receipt['blockNumber'] <= latest_block - self.FINALITY_DEPTH:
+            self._result_cache[cache_key] = result
+            if len(self._result_cache) > self.RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        
+        return dict(result)
+    
+    async def decode_swaps_async(self, tx_hashes: List[str], concurrency: int = 8) -> List[Any]:
+        """Decode several transactions concurrently, at most `concurrency` in flight at once.
+        
+        Results are in tx_hashes order; a transaction that fails to decode yields its exception.
+        """
+        # Connect up front so the concurrent decodes don't all probe the node
+        await self.connect()
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def decode_one(tx_hash: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.decode_swap_async(tx_hash)
+        
+        return await asyncio.gather(*[decode_one(tx_hash) for tx_hash in tx_hashes], return_exceptions=True)
+    
+    @classmethod
+    def _format_amount(cls, amount: int, decimals: int) -> str:
+        """Format a raw token amount as an exact decimal string (1500000 with 6 decimals -> 1.5)"""
+        divisor = cls._POW10[decimals] if decimals < len(cls._POW10) else 10 ** decimals
+        whole, fraction = divmod(amount, divisor)
+        fraction_digits = str(fraction).rjust(decimals, "0").rstrip("0") or "0"
+        return f"{whole}.{fraction_digits}"
+    
+    async def _single_flight(self, key: Any, make_coroutine: Callable[[], Awaitable[Any]]) -> Any:
+        """Await make_coroutine(), sharing a single run between concurrent callers with the same key"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make_coroutine())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so a caller being cancelled doesn't cancel the lookup for the others
+        return await asyncio.shield(task)
+    
+    async def _has_multicall(self) -> bool:
+        """Check (once) whether Multicall3 is deployed on the connected chain"""
+        deployed = self._multicall_deployed.get(self._node_url)
+        if deployed is None:
+            deployed = await self._single_flight(("multicall", self._node_url), self._check_multicall)
+        return deployed
+    
+    async def _check_multicall(self) -> bool:
+        """Look up whether Multicall3 is deployed on the connected chain"""
+        deployed = len(await self.w3.eth.get_code(self.MULTICALL3)) > 0
+        self._multicall_deployed[self._node_url] = deployed
+        return deployed
+    
+    async def _get_chain_head(self) -> int:
+        """Latest block number, fetched at most once per CHAIN_HEAD_TTL seconds"""
+        chain_head = self._chain_heads.get(self._node_url)
+        if chain_head is None or time.monotonic() - chain_head[0] > self.CHAIN_HEAD_TTL:
+            chain_head = await self._single_flight(("head", self._node_url), self._fetch_chain_head)
+        return chain_head[1]
+    
+    async def _fetch_chain_head(self) -> Tuple[float, int]:
+        """Fetch the latest block number and cache it"""
+        chain_head = (time.monotonic(), await self.w3.eth.block_number)
+        self._chain_heads[self._node_url] = chain_head
+        return chain_head
+    
+    async def _call(self, to: str, data: bytes) -> bytes:
+        """Send a raw eth_call and return the undecoded result"""
+        return await self.w3.eth.call({"to": to, "data": data})
+    
+    async def _aggregate(self, calls: List[Tuple[str, bytes]], allow_failure: bool = False) -> List[Optional[bytes]]:
+        """Run several eth_calls as a single Multicall3 aggregate3 call.
+        
+        Returns the raw return data of each call, or None for calls that reverted.
+        """
+        call_data = self.SEL_AGGREGATE3 + eth_abi.encode(
+            ["(address,bool,bytes)[]"],
+            [[(target, allow_failure, data) for target, data in calls]]
+        )
+        results = eth_abi.decode(["(bool,bytes)[]"], await self._call(self.MULTICALL3, call_data))[0]
+        return [return_data if success else None for success, return_data in results]
+    
+    @staticmethod
+    def _decode_address(return_data: bytes) -> str:
+        """ABI-decode an address return value (eth_abi returns it lowercase)"""
+        return checksum_address(eth_abi.decode(["address"], return_data)[0])
     
-    def _get_token_decimals(self, token_address: str) -> int:
-        """Get token decimals"""
+    @staticmethod
+    def _decode_result(abi_type: str, return_data: Optional[bytes], default: Any) -> Any:
+        """ABI-decode a single return value, default if the call reverted or can't be decoded"""
+        if return_data is None:
+            return default
         try:
-            token_contract = self.w3.eth.contract(
-                address=token_address,
-                abi=self.ERC20_ABI
+            return eth_abi.decode([abi_type], return_data)[0]
+        except (DecodingError, UnicodeDecodeError):
+            return default
+    
+    async def _get_pool_tokens(self, pool_address: str) -> Tuple[str, str]:
+        """Get pool token0 and token1, in a single aggregated call if not cached yet"""
+        pool_tokens = self._pool_cache.get(pool_address)
+        if pool_tokens is None:
+            pool_tokens = await self._single_flight(
+                ("pool", self._chain_id, pool_address), lambda: self._fetch_pool_tokens(pool_address)
             )
-            return token_contract.functions.decimals().call()
-        except:
-            # Default to 18 for ETH and most tokens if call fails
-            return 18
+        return pool_tokens
+    
+    async def _fetch_pool_tokens(self, pool_address: str) -> Tuple[str, str]:
+        """Fetch pool token0 and token1 and cache them"""
+        calls = [(pool_address, self.SEL_TOKEN0), (pool_address, self.SEL_TOKEN1)]
+        if await self._has_multicall():
+            token0_data, token1_data = await self._aggregate(calls)
+        else:
+            token0_data, token1_data = await asyncio.gather(*[self._call(target, data) for target, data in calls])
+        
+        pool_tokens = (self._decode_address(token0_data), self._decode_address(token1_data))
+        self._pool_cache[pool_address] = pool_tokens
+        self._dirty_caches[self.POOL_CACHE_FILE.format(chain_id=self._chain_id)] = self._pool_cache
+        return pool_tokens
     
-    def _get_token_symbol(self, token_address: str) -> str:
-        """Get token symbol"""
+    async def _get_tokens_info(self, token_addresses: List[str]) -> Tuple[List[int], List[str], bool]:
+        """Get decimals and symbols for several tokens, fetching only those not cached yet.
+        
+        The flag is False if a call failed and a default was used in place of its value.
+        """
+        missing = tuple(address for address in dict.fromkeys(token_addresses) if address not in self._token_cache)
+        fetched = {}
+        if missing:
+            fetched = await self._single_flight(
+                ("tokens", self._chain_id, missing), lambda: self._fetch_tokens_info(missing)
+            )
+        
+        decimals, symbols = [], []
+        complete = True
+        for address in token_addresses:
+            if address in self._token_cache:
+                token_decimals = self._token_cache[address]["decimals"]
+                token_symbol = self._token_cache[address]["symbol"]
+            else:
+                token_decimals, token_symbol = fetched[address]
+                complete = complete and token_decimals is not None and token_symbol is not None
+            decimals.append(self.DEFAULT_DECIMALS if token_decimals is None else token_decimals)
+            symbols.append(self.DEFAULT_SYMBOL if token_symbol is None else token_symbol)
+        return decimals, symbols, complete
+    
+    async def _fetch_tokens_info(self, token_addresses: Tuple[str, ...]) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+        """Fetch decimals and symbols for several tokens and cache the complete answers"""
+        if await self._has_multicall():
+            decimals, symbols = await self._multicall_get_tokens_info(list(token_addresses))
+        else:
+            decimals, symbols = await self._gather_get_tokens_info(list(token_addresses))
+        
+        fetched = dict(zip(token_addresses, zip(decimals, symbols)))
+        # Calls that raised (None) may just be a flaky node, so only cache complete answers
+        new_entries = {
+            address: {"decimals": token_decimals, "symbol": token_symbol}
+            for address, (token_decimals, token_symbol) in fetched.items()
+            if token_decimals is not None and token_symbol is not None
+        }
+        if new_entries:
+            self._token_cache.update(new_entries)
+            self._dirty_caches[self.TOKEN_CACHE_FILE.format(chain_id=self._chain_id)] = self._token_cache
+        return fetched
+    
+    async def _multicall_get_tokens_info(self, token_addresses: List[str]) -> Tuple[List[int], List[str]]:
+        """Get decimals and symbols for several tokens in a single aggregated call"""
+        calls = [(token_address, self.SEL_DECIMALS) for token_address in token_addresses]
+        calls += [(token_address, self.SEL_SYMBOL) for token_address in token_addresses]
+        results = await self._aggregate(calls, allow_failure=True)
+        
+        # A reverted or undecodable call (e.g. a bytes32 symbol) is final, so it gets the default
+        decimals = [
+            self._decode_result("uint8", data, self.DEFAULT_DECIMALS) for data in results[:len(token_addresses)]
+        ]
+        symbols = [
+            self._decode_result("string", data, self.DEFAULT_SYMBOL) for data in results[len(token_addresses):]
+        ]
+        return decimals, symbols
+    
+    async def _gather_get_tokens_info(self, token_addresses: List[str]) -> Tuple[List[Optional[int]], List[Optional[str]]]:
+        """Get decimals and symbols for several tokens with concurrent individual calls"""
+        results = await asyncio.gather(
+            *[self._get_token_decimals(token_address) for token_address in token_addresses],
+            *[self._get_token_symbol(token_address) for token_address in token_addresses],
+        )
+        return list(results[:len(token_addresses)]), list(results[len(token_addresses):])
+    
+    async def _get_token_decimals(self, token_address: str) -> Optional[int]:
+        """Get token decimals, the default if it reverts and None if the call fails"""
         try:
-            token_contract = self.w3.eth.contract(
-                address=token_address,
-                abi=self.ERC20_ABI
+            return_data = await self._call(token_address, self.SEL_DECIMALS)
+        except ContractLogicError:
+            return_data = None
+        except Exception:
+            return None
+        return self._decode_result("uint8", return_data, self.DEFAULT_DECIMALS)
+    
+    async def _get_token_symbol(self, token_address: str) -> Optional[str]:
+        """Get token symbol, the default if it reverts and None if the call fails"""
+        try:
+            return_data = await self._call(token_address, self.SEL_SYMBOL)
+        except ContractLogicError:
+            return_data = None
+        except Exception:
+            return None
+        return self._decode_result("string", return_data, self.DEFAULT_SYMBOL)
+    
+    @classmethod
+    def _get_router(cls) -> Any:
+        """Router contract used to decode call inputs, parsed once per process"""
+        if cls._router is None:
+            cls._router = Web3().eth.contract(address=cls.UNISWAP_V3_ROUTER, abi=cls.ROUTER_ABI)
+        return cls._router
+    
+    def _load_shared_caches(self, chain_id: int) -> None:
+        """Use the token and pool caches of chain_id, loaded from disk once per process"""
+        if chain_id not in self._token_caches:
+            self._token_caches[chain_id] = self._load_token_cache(chain_id)
+        self._token_cache = self._token_caches[chain_id]
+        if chain_id not in self._pool_caches:
+            self._pool_caches[chain_id] = self._load_pool_cache(chain_id)
+        self._pool_cache = self._pool_caches[chain_id]
+    
+    @classmethod
+    def _load_token_cache(cls, chain_id: int) -> Dict[str, Dict[str, Any]]:
+        """Load token metadata cached on disk, on top of the well-known mainnet tokens"""
+        token_cache = {}
+        if chain_id == cls.MAINNET_CHAIN_ID:
+            token_cache.update(
+                (address, {"decimals": token_decimals, "symbol": token_symbol})
+                for address, (token_decimals, token_symbol) in cls.KNOWN_TOKENS.items()
             )
-            return token_contract.functions.symbol().call()
-        except:
-            return "UNKNOWN"
+        token_cache.update(cls._load_cache(cls.TOKEN_CACHE_FILE.format(chain_id=chain_id)))
+        return token_cache
+    
+    @classmethod
+    def _load_pool_cache(cls, chain_id: int) -> Dict[str, Tuple[str, str]]:
+        """Load pool tokens cached on disk, on top of the well-known mainnet pools"""
+        pool_cache = dict(cls.KNOWN_POOLS) if chain_id == cls.MAINNET_CHAIN_ID else {}
+        pool_cache.update(
+            (pool_address, tuple(pool_tokens))
+            for pool_address, pool_tokens in cls._load_cache(cls.POOL_CACHE_FILE.format(chain_id=chain_id)).items()
+        )
+        return pool_cache
+    
+    @staticmethod
+    def _load_cache(path: str) -> Dict[str, Any]:
+        """Read a JSON cache file, empty if missing or corrupt"""
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # It will be rebuilt on the next miss
+            return {}
+    
+    @classmethod
+    def _flush_caches(cls) -> None:
+        """Write the caches changed since the last flush back to disk"""
+        while cls._dirty_caches:
+            path, cache = cls._dirty_caches.popitem()
+            # Write a snapshot, decodes on other threads may still be adding entries
+            cls._save_cache(path, dict(cache))
+    
+    @staticmethod
+    def _save_cache(path: str, data: Dict[str, Any]) -> None:
+        """Atomically write a JSON cache file (best effort)"""
+        try:
+            cache_dir = os.path.dirname(path)
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            pass
+
+# Write cache entries still pending if the decoder is never closed
+atexit.register(UniswapV3Decoder._flush_caches)
 
-def main():
+async def main():
     """Example usage with test transactions"""
     
     # Initialize decoder
@@ -268,15 +799,22 @@ def main():
     print("Uniswap V3 Transaction Decoder")
     print("=" * 60)
     
-    for tx_hash in test_transactions:
-        try:
-            print(f"\nDecoding transaction: {tx_hash}")
-            result = decoder.decode_swap(tx_hash)
+    # Decode all transactions concurrently, then print them in order
+    try:
+        results = await decoder.decode_swaps_async(test_transactions)
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return
+    finally:
+        await decoder.aclose()
+    
+    for tx_hash, result in zip(test_transactions, results):
+        print(f"\nDecoding transaction: {tx_hash}")
+        if isinstance(result, Exception):
+            print(f"Error decoding {tx_hash}: {str(result)}")
+        else:
             print(json.dumps(result, indent=2, default=str))
-            print("-" * 60)
-        except Exception as e:
-            print(f"Error decoding {tx_hash}: {str(e)}")
-            print("-" * 60)
+        print("-" * 60)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())